@@ -4,6 +4,7 @@ require('dotenv').config();
 const express = require('express');
 const { connectDB, closeDB } = require('./config/db');
 const { startScheduler } = require('./services/scheduler');
+const { ensureDailyStats } = require('./services/gitlab-sync');
 
 const app = express();
 const PORT = process.env.PORT || 3000;
@@ -30,6 +31,10 @@ async function start() {
   await connectDB();
   startScheduler();
   app.listen(PORT, () => console.log(`Dashboard: http://localhost:${PORT}`));
+
+  // Can take a while on the first start after an upgrade; the charts serve
+  // empty data until the rollup exists.
+  ensureDailyStats().catch(err => console.error('[gitlab-sync] Rollup build failed:', err.message));
 }
 
 start().catch(console.error);
@@ -4,10 +4,71 @@ let client;
 let db;
 
 async function connectDB() {
-  client = new MongoClient(process.env.MONGODB_URI);
+  if (db) return db;
+  const options = {};
+  if (process.env.MONGODB_MAX_POOL_SIZE) options.maxPoolSize = parseInt(process.env.MONGODB_MAX_POOL_SIZE);
+  client = new MongoClient(process.env.MONGODB_URI, options);
   await client.connect();
   db = client.db('afonsystem');
   console.log('Connected to MongoDB (afonsystem)');
+  await ensureIndexes();
+  return db;
+}
+
+// Sync upserts are keyed on these fields. A non-unique index left by an
+// older version is rebuilt as unique; if existing duplicates prevent that,
+// a plain index is kept and the duplicates are reported instead of
+// blocking startup.
+async function ensureUniqueIndex(collection, keys) {
+  const col = db.collection(collection);
+  try {
+    await col.createIndex(keys, { unique: true });
+    return;
+  } catch (err) {
+    if (err.code === 11000) return keepPlainIndex(col, keys, {});
+    if (err.code !== 85 && err.code !== 86) throw err;
+  }
+
+  // Same key already indexed, possibly under a custom name.
+  const spec = JSON.stringify(keys);
+  const existing = (await col.indexes()).find(index => JSON.stringify(index.key) === spec);
+  if (!existing || existing.unique) return;
+
+  await col.dropIndex(existing.name);
+  try {
+    await col.createIndex(keys, { unique: true });
+  } catch (err) {
+    if (err.code !== 11000) throw err;
+    await keepPlainIndex(col, keys, { name: existing.name });
+  }
+}
+
+async function keepPlainIndex(col, keys, options) {
+  console.warn(`Duplicate documents in ${col.collectionName} for ${JSON.stringify(keys)}; index not unique`);
+  await col.createIndex(keys, options);
+}
+
+async function ensureIndexes() {
+  await Promise.all([
+    ensureUniqueIndex('projects', { project_id: 1 }),
+    ensureUniqueIndex('members', { project_id: 1, user_id: 1 }),
+    db.collection('members').createIndex({ username: 1 }),
+    db.collection('members').createIndex({ name: 1 }),
+    db.collection('members').createIndex({ access_level: 1, name: 1 }),
+    ensureUniqueIndex('commits', { project_id: 1, sha: 1 }),
+    db.collection('commits').createIndex({ project_id: 1, committed_date: -1 }),
+    db.collection('commits').createIndex({ author_name: 1, project_id: 1 }),
+    db.collection('commits_daily').createIndex({ project_id: 1, day: 1 }),
+    db.collection('commits_daily').createIndex({ author_name: 1, day: 1 }),
+    db.collection('commits_daily').createIndex({ day: 1 }),
+    ensureUniqueIndex('merge_requests', { project_id: 1, iid: 1 }),
+    db.collection('merge_requests').createIndex({ project_id: 1, created_at: 1 }),
+    db.collection('merge_requests').createIndex({ author_username: 1, project_id: 1 }),
+    ensureUniqueIndex('issues', { project_id: 1, iid: 1 }),
+    db.collection('issues').createIndex({ project_id: 1, created_at: 1 }),
+    db.collection('issues').createIndex({ author_username: 1, project_id: 1 }),
+    ensureUniqueIndex('sync_state', { project_id: 1, endpoint: 1 }),
+  ]);
 }
 
 function getDB() {
@@ -17,6 +78,8 @@ function getDB() {
 
 async function closeDB() {
   if (client) await client.close();
+  client = null;
+  db = null;
 }
 
 module.exports = { connectDB, getDB, closeDB };
@@ -3,22 +3,33 @@ var COLORS = [
   '#fd7e14', '#ffc107', '#198754', '#20c997', '#0dcaf0'
 ];
 
-function renderInlineChart(canvasId, type, data) {
-  var canvas = document.getElementById(canvasId);
-  if (!canvas) return;
+// Above this many points per series, line charts skip point markers and
+// animations, which dominate canvas render time on long date ranges.
+var LARGE_SERIES = 500;
+
+function createChart(canvas, type, data) {
+  var large = data.labels.length > LARGE_SERIES;
   data.datasets.forEach(function(ds, i) {
     if (!ds.backgroundColor) ds.backgroundColor = COLORS[i % COLORS.length];
-    if (!ds.borderColor && type === 'line') ds.borderColor = COLORS[i % COLORS.length];
-  });
-  new Chart(canvas, {
-    type: type,
-    data: data,
-    options: {
-      responsive: true,
-      maintainAspectRatio: false,
-      plugins: { legend: { position: 'bottom' } }
+    if (type === 'line') {
+      if (!ds.borderColor) ds.borderColor = COLORS[i % COLORS.length];
+      if (large) ds.pointRadius = 0;
     }
   });
+  var options = {
+    responsive: true,
+    maintainAspectRatio: false,
+    normalized: true,
+    plugins: { legend: { position: 'bottom' } }
+  };
+  if (large) options.animation = false;
+  return new Chart(canvas, { type: type, data: data, options: options });
+}
+
+function renderInlineChart(canvasId, type, data) {
+  var canvas = document.getElementById(canvasId);
+  if (!canvas) return;
+  createChart(canvas, type, data);
 }
 
 document.addEventListener('DOMContentLoaded', function() {
@@ -37,19 +48,7 @@ document.addEventListener('DOMContentLoaded', function() {
           canvas.parentElement.innerHTML = '<div class="no-data">Sem dados</div>';
           return;
         }
-        data.datasets.forEach(function(ds, i) {
-          if (!ds.backgroundColor) ds.backgroundColor = COLORS[i % COLORS.length];
-          if (!ds.borderColor && chartType === 'line') ds.borderColor = COLORS[i % COLORS.length];
-        });
-        new Chart(canvas, {
-          type: chartType,
-          data: data,
-          options: {
-            responsive: true,
-            maintainAspectRatio: false,
-            plugins: { legend: { position: 'bottom' } }
-          }
-        });
+        createChart(canvas, chartType, data);
       })
       .catch(function() {
         canvas.parentElement.innerHTML = '<div class="no-data">Erro ao carregar</div>';
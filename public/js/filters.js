@@ -16,9 +16,11 @@ document.addEventListener('DOMContentLoaded', function() {
       var url = '/api/export' + (params ? '?' + params : '');
 
       fetch(url)
-        .then(function(res) { return res.json(); })
-        .then(function(data) {
-          var blob = new Blob([JSON.stringify(data, null, 2)], { type: 'application/json' });
+        .then(function(res) {
+          if (!res.ok) throw new Error(res.statusText);
+          return res.blob();
+        })
+        .then(function(blob) {
           var a = document.createElement('a');
           a.href = URL.createObjectURL(blob);
           a.download = 'metricas_' + new Date().toISOString().slice(0, 10) + '.json';
@@ -1,16 +1,28 @@
+const { pipeline } = require('stream/promises');
 const express = require('express');
 const router = express.Router();
 const { getDB } = require('../config/db');
-const { buildCommitFilter, buildMRFilter, buildIssueFilter } = require('../utils/filters');
+const { buildCommitFilter, buildDailyFilter, buildMRFilter, buildIssueFilter } = require('../utils/filters');
+const { commitsByAuthor, commitsPerDay, stateCounts } = require('../services/metrics');
+
+const MR_STATUS_COLORS = { opened: '#0d6efd', merged: '#198754', closed: '#dc3545' };
+const ISSUE_STATUS_COLORS = { opened: '#0d6efd', closed: '#198754' };
+
+function statusChart(result, colors) {
+  const labels = [];
+  const data = [];
+  const backgroundColor = [];
+  for (const r of result) {
+    labels.push(r._id);
+    data.push(r.count);
+    backgroundColor.push(colors[r._id] || '#6c757d');
+  }
+  return { labels, datasets: [{ data, backgroundColor }] };
+}
 
 router.get('/commits-per-student', async (req, res) => {
-  const db = getDB();
-  const filter = buildCommitFilter(req.query);
-  const result = await db.collection('commits').aggregate([
-    { $match: filter },
-    { $group: { _id: '$author_name', count: { $sum: 1 } } },
-    { $sort: { count: -1 } },
-  ]).toArray();
+  const result = [...await commitsByAuthor(buildDailyFilter(req.query))]
+    .sort((a, b) => b.count - a.count);
 
   res.json({
     labels: result.map(r => r._id),
@@ -19,14 +31,7 @@ router.get('/commits-per-student', async (req, res) => {
 });
 
 router.get('/commits-over-time', async (req, res) => {
-  const db = getDB();
-  const filter = buildCommitFilter(req.query);
-  const result = await db.collection('commits').aggregate([
-    { $match: filter },
-    { $addFields: { date: { $substr: ['$committed_date', 0, 10] } } },
-    { $group: { _id: '$date', count: { $sum: 1 } } },
-    { $sort: { _id: 1 } },
-  ]).toArray();
+  const result = await commitsPerDay(buildDailyFilter(req.query));
 
   res.json({
     labels: result.map(r => r._id),
@@ -35,17 +40,8 @@ router.get('/commits-over-time', async (req, res) => {
 });
 
 router.get('/lines-per-student', async (req, res) => {
-  const db = getDB();
-  const filter = buildCommitFilter(req.query);
-  const result = await db.collection('commits').aggregate([
-    { $match: filter },
-    { $group: {
-      _id: '$author_name',
-      additions: { $sum: '$additions' },
-      deletions: { $sum: '$deletions' },
-    }},
-    { $sort: { additions: -1 } },
-  ]).toArray();
+  const result = [...await commitsByAuthor(buildDailyFilter(req.query))]
+    .sort((a, b) => b.additions - a.additions);
 
   res.json({
     labels: result.map(r => r._id),
@@ -57,66 +53,64 @@ router.get('/lines-per-student', async (req, res) => {
 });
 
 router.get('/mr-status', async (req, res) => {
-  const db = getDB();
-  const filter = buildMRFilter(req.query);
-  const result = await db.collection('merge_requests').aggregate([
-    { $match: filter },
-    { $group: { _id: '$state', count: { $sum: 1 } } },
-  ]).toArray();
+  const result = await stateCounts('merge_requests', buildMRFilter(req.query));
 
-  const statusColors = { opened: '#0d6efd', merged: '#198754', closed: '#dc3545' };
-  res.json({
-    labels: result.map(r => r._id),
-    datasets: [{
-      data: result.map(r => r.count),
-      backgroundColor: result.map(r => statusColors[r._id] || '#6c757d'),
-    }],
-  });
+  res.json(statusChart(result, MR_STATUS_COLORS));
 });
 
 router.get('/issue-status', async (req, res) => {
-  const db = getDB();
-  const filter = buildIssueFilter(req.query);
-  const result = await db.collection('issues').aggregate([
-    { $match: filter },
-    { $group: { _id: '$state', count: { $sum: 1 } } },
-  ]).toArray();
+  const result = await stateCounts('issues', buildIssueFilter(req.query));
 
-  const statusColors = { opened: '#0d6efd', closed: '#198754' };
-  res.json({
-    labels: result.map(r => r._id),
-    datasets: [{
-      data: result.map(r => r.count),
-      backgroundColor: result.map(r => statusColors[r._id] || '#6c757d'),
-    }],
-  });
+  res.json(statusChart(result, ISSUE_STATUS_COLORS));
 });
 
+async function* jsonArray(cursor) {
+  let count = 0;
+  for await (const doc of cursor) {
+    yield (count ? ',' : '') + JSON.stringify(doc);
+    count++;
+  }
+  return count;
+}
+
 router.get('/export', async (req, res) => {
   const db = getDB();
   const commitFilter = buildCommitFilter(req.query);
   const mrFilter = buildMRFilter(req.query);
   const noId = { projection: { _id: 0 } };
 
-  const [commits, mergeRequests] = await Promise.all([
-    db.collection('commits').find(commitFilter, noId).sort({ committed_date: -1 }).toArray(),
-    db.collection('merge_requests').find(mrFilter, noId).sort({ created_at: -1 }).toArray(),
-  ]);
-
   const filters = {};
   if (req.query.project_id) filters.project_id = parseInt(req.query.project_id);
   if (req.query.username) filters.username = req.query.username;
   if (req.query.from) filters.from = req.query.from;
   if (req.query.to) filters.to = req.query.to;
 
-  res.json({
-    exported_at: new Date().toISOString(),
-    filters,
-    total_commits: commits.length,
-    total_merge_requests: mergeRequests.length,
-    commits,
-    merge_requests: mergeRequests,
-  });
+  const commits = db.collection('commits').find(commitFilter, noId).sort({ committed_date: -1 });
+  const mergeRequests = db.collection('merge_requests').find(mrFilter, noId).sort({ created_at: -1 });
+
+  // Totals are counted while streaming and written after the arrays, so
+  // they always match what was exported even if a sync runs meanwhile.
+  async function* body() {
+    yield `{"exported_at":${JSON.stringify(new Date().toISOString())}`
+      + `,"filters":${JSON.stringify(filters)}`
+      + ',"commits":[';
+    const totalCommits = yield* jsonArray(commits);
+    yield '],"merge_requests":[';
+    const totalMergeRequests = yield* jsonArray(mergeRequests);
+    yield `],"total_commits":${totalCommits},"total_merge_requests":${totalMergeRequests}}`;
+  }
+
+  // Stream rows straight from the cursors instead of buffering both
+  // collections. pipeline() honours backpressure, and tears down the
+  // response on a cursor error or the generator when the client goes away.
+  res.type('json');
+  try {
+    await pipeline(body(), res);
+  } catch (err) {
+    if (err.code !== 'ERR_STREAM_PREMATURE_CLOSE') console.error('[api] Export failed:', err.message);
+  } finally {
+    await Promise.all([commits.close(), mergeRequests.close()]);
+  }
 });
 
 module.exports = router;
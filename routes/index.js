@@ -1,38 +1,47 @@
 const express = require('express');
 const router = express.Router();
 const { getDB } = require('../config/db');
-const { buildCommitFilter, buildMRFilter, buildIssueFilter } = require('../utils/filters');
+const { buildDailyFilter, buildMRFilter, buildIssueFilter } = require('../utils/filters');
+const { cached } = require('../utils/cache');
+const { commitTotals, stateCounts } = require('../services/metrics');
 
 router.get('/', async (req, res) => {
   const db = getDB();
 
-  const commitFilter = buildCommitFilter(req.query);
+  const dailyFilter = buildDailyFilter(req.query);
   const mrFilter = buildMRFilter(req.query);
   const issueFilter = buildIssueFilter(req.query);
-  const projectFilter = req.query.project_id ? { project_id: parseInt(req.query.project_id) } : {};
 
-  const ccFilter = (prefix) => ({
-    ...commitFilter,
-    message: { $regex: `^${prefix}(\\(.+\\))?:`, $options: 'i' },
-  });
-
-  const [projects, commits, mergeRequests, issues, projectsList, membersList,
-    ccFeat, ccFix, ccDocs, ccChore] = await Promise.all([
-    db.collection('projects').countDocuments(projectFilter),
-    db.collection('commits').countDocuments(commitFilter),
-    db.collection('merge_requests').countDocuments(mrFilter),
-    db.collection('issues').countDocuments(issueFilter),
-    db.collection('projects').find({}, { projection: { project_id: 1, name: 1, path_with_namespace: 1, default_branch: 1, created_at: 1 } }).toArray(),
-    db.collection('members').distinct('name', { access_level: { $lt: 50 } }),
-    db.collection('commits').countDocuments(ccFilter('feat')),
-    db.collection('commits').countDocuments(ccFilter('fix')),
-    db.collection('commits').countDocuments(ccFilter('docs')),
-    db.collection('commits').countDocuments(ccFilter('chore')),
+  const [[commitStats], mrStates, issueStates, projectsList, membersList] = await Promise.all([
+    commitTotals(dailyFilter),
+    stateCounts('merge_requests', mrFilter),
+    stateCounts('issues', issueFilter),
+    cached('projects-list', () =>
+      db.collection('projects').find({}, { projection: { project_id: 1, name: 1, path_with_namespace: 1, default_branch: 1, created_at: 1 } }).toArray()
+    ),
+    cached('members-list', () =>
+      db.collection('members').distinct('name', { access_level: { $lt: 50 } })
+    ),
   ]);
 
+  const projects = req.query.project_id
+    ? projectsList.filter(p => p.project_id === parseInt(req.query.project_id)).length
+    : projectsList.length;
+  const sumCounts = (rows) => rows.reduce((total, r) => total + r.count, 0);
+  const cc = commitStats || { total: 0, feat: 0, fix: 0, docs: 0, chore: 0 };
+
   res.render('pages/dashboard', {
     title: 'Dashboard',
-    stats: { projects, commits, mergeRequests, issues, ccFeat, ccFix, ccDocs, ccChore },
+    stats: {
+      projects,
+      commits: cc.total,
+      mergeRequests: sumCounts(mrStates),
+      issues: sumCounts(issueStates),
+      ccFeat: cc.feat,
+      ccFix: cc.fix,
+      ccDocs: cc.docs,
+      ccChore: cc.chore,
+    },
     projectsList,
     membersList,
     selectedProject: req.query.project_id || '',
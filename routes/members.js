@@ -2,25 +2,30 @@ const express = require('express');
 const router = express.Router();
 const { getDB } = require('../config/db');
 
+const MEMBER_FIELDS = { _id: 0, project_id: 1, username: 1, name: 1 };
+const PROJECT_FIELDS = { _id: 0, project_id: 1, name: 1, path_with_namespace: 1 };
+const COMMIT_FIELDS = { _id: 0, short_id: 1, project_id: 1, committed_date: 1, message: 1, additions: 1, deletions: 1 };
+const ITEM_FIELDS = { _id: 0, iid: 1, title: 1, state: 1, created_at: 1 };
+
 router.get('/:username', async (req, res) => {
   const db = getDB();
   const username = req.params.username;
 
-  const memberDocs = await db.collection('members').find({ username }).toArray();
-  if (memberDocs.length === 0) {
-    const memberByName = await db.collection('members').find({ name: username }).toArray();
-    if (memberByName.length === 0) return res.status(404).render('pages/404', { title: '404' });
-    memberDocs.push(...memberByName);
-  }
+  const matches = await db.collection('members')
+    .find({ $or: [{ username }, { name: username }] }, { projection: MEMBER_FIELDS })
+    .toArray();
+  const byUsername = matches.filter(m => m.username === username);
+  const memberDocs = byUsername.length > 0 ? byUsername : matches;
+  if (memberDocs.length === 0) return res.status(404).render('pages/404', { title: '404' });
 
   const member = memberDocs[0];
   const projectIds = memberDocs.map(m => m.project_id);
 
   const [projects, commits, mergeRequests, issues] = await Promise.all([
-    db.collection('projects').find({ project_id: { $in: projectIds } }).toArray(),
-    db.collection('commits').find({ author_name: member.name, project_id: { $in: projectIds } }).sort({ committed_date: -1 }).toArray(),
-    db.collection('merge_requests').find({ author_username: member.username, project_id: { $in: projectIds } }).toArray(),
-    db.collection('issues').find({ author_username: member.username, project_id: { $in: projectIds } }).toArray(),
+    db.collection('projects').find({ project_id: { $in: projectIds } }, { projection: PROJECT_FIELDS }).toArray(),
+    db.collection('commits').find({ author_name: member.name, project_id: { $in: projectIds } }, { projection: COMMIT_FIELDS }).sort({ committed_date: -1 }).toArray(),
+    db.collection('merge_requests').find({ author_username: member.username, project_id: { $in: projectIds } }, { projection: ITEM_FIELDS }).toArray(),
+    db.collection('issues').find({ author_username: member.username, project_id: { $in: projectIds } }, { projection: ITEM_FIELDS }).toArray(),
   ]);
 
   const projectMap = {};
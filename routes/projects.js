@@ -2,16 +2,21 @@ const express = require('express');
 const router = express.Router();
 const { getDB } = require('../config/db');
 
+const MEMBER_FIELDS = { _id: 0, name: 1, username: 1, access_level: 1 };
+const COMMIT_FIELDS = { _id: 0, short_id: 1, author_name: 1, committed_date: 1, message: 1, additions: 1, deletions: 1 };
+const MR_FIELDS = { _id: 0, iid: 1, title: 1, author_name: 1, state: 1, created_at: 1, merged_at: 1 };
+const ISSUE_FIELDS = { _id: 0, iid: 1, title: 1, author_name: 1, state: 1, labels: 1, created_at: 1, closed_at: 1 };
+
 router.get('/:id', async (req, res) => {
   const db = getDB();
   const projectId = parseInt(req.params.id);
 
   const [project, members, commits, mergeRequests, issues] = await Promise.all([
     db.collection('projects').findOne({ project_id: projectId }),
-    db.collection('members').find({ project_id: projectId }).toArray(),
-    db.collection('commits').find({ project_id: projectId }).sort({ committed_date: -1 }).toArray(),
-    db.collection('merge_requests').find({ project_id: projectId }).toArray(),
-    db.collection('issues').find({ project_id: projectId }).toArray(),
+    db.collection('members').find({ project_id: projectId }, { projection: MEMBER_FIELDS }).toArray(),
+    db.collection('commits').find({ project_id: projectId }, { projection: COMMIT_FIELDS }).sort({ committed_date: -1 }).toArray(),
+    db.collection('merge_requests').find({ project_id: projectId }, { projection: MR_FIELDS }).toArray(),
+    db.collection('issues').find({ project_id: projectId }, { projection: ISSUE_FIELDS }).toArray(),
   ]);
 
   if (!project) return res.status(404).render('pages/404', { title: '404' });
@@ -1,27 +1,144 @@
 const { getDB } = require('../config/db');
+const { clearCache } = require('../utils/cache');
 
 const GITLAB_URL = process.env.GITLAB_URL;
 const GITLAB_PAT = process.env.GITLAB_PAT;
 
 const headers = { 'PRIVATE-TOKEN': GITLAB_PAT };
 
+// Projects synced in parallel; GitLab calls are I/O bound.
+const SYNC_CONCURRENCY = Math.max(1, parseInt(process.env.GITLAB_SYNC_CONCURRENCY) || 4);
+
+const RATE_LIMIT_RETRIES = 5;
+const RATE_LIMIT_FLOOR = 20;
+
+// Upserts per bulkWrite call for the project list, which is written in one
+// go. Paginated endpoints write each page (at most 100 items) as it arrives.
+const BULK_BATCH_SIZE = 1000;
+
+// Merge requests and issues are re-fetched from this long before the last
+// completed walk started, so clock skew against GitLab can't open a gap.
+const SINCE_OVERLAP_MS = 24 * 60 * 60 * 1000;
+
+const COMMIT_TYPES = ['feat', 'fix', 'docs', 'chore'];
+
+const commitTypePattern = (type) => `^${type}(\\(.+\\))?:`;
+
+const COMMIT_TYPE_RE = new RegExp(commitTypePattern(`(${COMMIT_TYPES.join('|')})`), 'i');
+
+function commitType(message) {
+  const match = COMMIT_TYPE_RE.exec(message || '');
+  return match ? match[1].toLowerCase() : 'other';
+}
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+function rateLimitWait(res) {
+  const retryAfter = parseInt(res.headers.get('retry-after'));
+  if (retryAfter >= 0) return retryAfter * 1000;
+  const reset = parseInt(res.headers.get('ratelimit-reset'));
+  if (reset) return Math.max(0, reset * 1000 - Date.now());
+  return 60 * 1000;
+}
+
+// Set once the remaining budget drops below RATE_LIMIT_FLOOR; every request
+// waits for it before going out, so no response is held through the pause.
+let throttledUntil = 0;
+
+// Waits out GitLab rate limiting instead of failing the whole sync midway:
+// retries 429s after Retry-After, and pauses until the window resets once
+// the remaining budget drops below RATE_LIMIT_FLOOR.
+async function gitlabGet(url) {
+  for (let attempt = 0; ; attempt++) {
+    const pause = throttledUntil - Date.now();
+    if (pause > 0) await sleep(pause);
+
+    const res = await fetch(url, { headers });
+    if (res.status === 429 && attempt < RATE_LIMIT_RETRIES) {
+      const wait = rateLimitWait(res);
+      console.warn(`[gitlab-sync] Rate limited, retrying in ${Math.ceil(wait / 1000)}s`);
+      // Release the connection rather than holding it through the wait.
+      await res.body?.cancel();
+      await sleep(wait);
+      continue;
+    }
+
+    const remaining = parseInt(res.headers.get('ratelimit-remaining'));
+    if (res.ok && remaining < RATE_LIMIT_FLOOR) {
+      throttledUntil = Math.max(throttledUntil, Date.now() + rateLimitWait(res));
+    }
+    return res;
+  }
+}
+
+async function fetchPage(url, params) {
+  const qs = new URLSearchParams(params).toString();
+  const res = await gitlabGet(`${url}?${qs}`);
+  if (!res.ok) {
+    throw new Error(`GitLab API error: ${res.status} ${res.statusText} for ${url}`);
+  }
+  const data = await res.json();
+
+  // GitLab sends an empty X-Next-Page on the last page; stopping there
+  // saves a trailing request for an empty page per endpoint.
+  let nextPage = res.headers.get('x-next-page');
+  if (nextPage === null && data.length === params.per_page) nextPage = params.page + 1;
+  return { data, nextPage: nextPage || null };
+}
+
+// Yields one page at a time. The next page is requested before the current
+// one is handed to the caller, so GitLab latency overlaps with whatever the
+// caller does per page (the bulk write, for the sync functions below).
+async function* paginate(url, params = {}) {
+  let pending = fetchPage(url, { ...params, per_page: 100, page: 1 });
+
+  while (pending) {
+    const { data, nextPage } = await pending;
+    pending = null;
+    if (nextPage) {
+      pending = fetchPage(url, { ...params, per_page: 100, page: parseInt(nextPage) });
+      // Handled when awaited on the next iteration; this only keeps a failure
+      // during the caller's work from surfacing as an unhandled rejection.
+      pending.catch(() => {});
+    }
+    yield data;
+  }
+}
+
 async function paginatedGet(url, params = {}) {
-  params.per_page = 100;
-  params.page = 1;
   const results = [];
+  for await (const page of paginate(url, params)) results.push(...page);
+  return results;
+}
 
-  while (true) {
-    const qs = new URLSearchParams(params).toString();
-    const res = await fetch(`${url}?${qs}`, { headers });
-    if (!res.ok) {
-      throw new Error(`GitLab API error: ${res.status} ${res.statusText} for ${url}`);
+async function upsertPages(collection, pages, toOp) {
+  let count = 0;
+  for await (const page of pages) {
+    if (!page.length) continue;
+    await bulkWriteInBatches(collection, page.map(toOp));
+    count += page.length;
+  }
+  return count;
+}
+
+async function bulkWriteInBatches(collection, ops) {
+  for (let i = 0; i < ops.length; i += BULK_BATCH_SIZE) {
+    await collection.bulkWrite(ops.slice(i, i + BULK_BATCH_SIZE), { ordered: false });
+  }
+}
+
+async function mapLimit(items, limit, fn) {
+  const results = new Array(items.length);
+  let next = 0;
+
+  async function worker() {
+    while (next < items.length) {
+      const i = next++;
+      results[i] = await fn(items[i]);
     }
-    const data = await res.json();
-    if (!data.length) break;
-    results.push(...data);
-    params.page++;
   }
 
+  await Promise.all(Array.from({ length: Math.min(limit, items.length) }, worker));
   return results;
 }
 
@@ -29,51 +146,62 @@ async function syncProjects() {
   const db = getDB();
   const projects = await paginatedGet(`${GITLAB_URL}/api/v4/projects`, { membership: true });
   console.log(`[gitlab-sync] Found ${projects.length} projects`);
+  if (!projects.length) return 0;
 
-  for (const project of projects) {
-    const pid = project.id;
-    const name = project.path_with_namespace;
-    console.log(`[gitlab-sync] --- ${name} (id=${pid}) ---`);
-
-    const doc = {
-      project_id: project.id,
-      name: project.name,
-      path_with_namespace: project.path_with_namespace,
-      description: project.description || null,
-      created_at: project.created_at,
-      default_branch: project.default_branch || null,
-      web_url: project.web_url,
-    };
-    await db.collection('projects').updateOne(
-      { project_id: doc.project_id },
-      { $set: doc },
-      { upsert: true }
-    );
-    console.log(`[gitlab-sync]   project saved`);
+  const ops = projects.map(project => ({
+    updateOne: {
+      filter: { project_id: project.id },
+      update: {
+        $set: {
+          project_id: project.id,
+          name: project.name,
+          path_with_namespace: project.path_with_namespace,
+          description: project.description || null,
+          created_at: project.created_at,
+          default_branch: project.default_branch || null,
+          web_url: project.web_url,
+        },
+      },
+      upsert: true,
+    },
+  }));
 
-    let n;
-    n = await syncMembers(pid);
-    console.log(`[gitlab-sync]   ${n} members`);
+  await bulkWriteInBatches(db.collection('projects'), ops);
+  const synced = await mapLimit(projects, SYNC_CONCURRENCY, syncProject);
+  const failed = synced.filter(ok => !ok).length;
+  if (failed) console.error(`[gitlab-sync] ${failed} of ${projects.length} projects failed to sync`);
 
-    n = await syncCommits(pid);
-    console.log(`[gitlab-sync]   ${n} commits`);
+  return projects.length;
+}
 
-    n = await syncMergeRequests(pid);
-    console.log(`[gitlab-sync]   ${n} merge requests`);
+const PROJECT_PARTS = ['members', 'commits', 'merge requests', 'issues'];
 
-    n = await syncIssues(pid);
-    console.log(`[gitlab-sync]   ${n} issues`);
-  }
+// Never rejects: a failing endpoint is logged and reported through the
+// return value, so sibling workers aren't left running unobserved.
+async function syncProject(project) {
+  const pid = project.id;
+  const name = project.path_with_namespace;
 
-  return projects.length;
+  const results = await Promise.allSettled([
+    syncMembers(pid),
+    syncCommits(pid),
+    syncMergeRequests(pid),
+    syncIssues(pid),
+  ]);
+
+  const ok = results.every(r => r.status === 'fulfilled');
+  const summary = results.map((r, i) => (r.status === 'fulfilled'
+    ? `${r.value} ${PROJECT_PARTS[i]}`
+    : `${PROJECT_PARTS[i]} failed (${r.reason.message})`));
+  (ok ? console.log : console.error)(`[gitlab-sync] ${name} (id=${pid}): ${summary.join(', ')}`);
+  return ok;
 }
 
 async function syncMembers(projectId) {
   const db = getDB();
-  const members = await paginatedGet(`${GITLAB_URL}/api/v4/projects/${projectId}/members/all`);
-  if (!members.length) return 0;
+  const pages = paginate(`${GITLAB_URL}/api/v4/projects/${projectId}/members/all`);
 
-  const ops = members.map(m => ({
+  return upsertPages(db.collection('members'), pages, m => ({
     updateOne: {
       filter: { project_id: projectId, user_id: m.id },
       update: {
@@ -88,20 +216,36 @@ async function syncMembers(projectId) {
       upsert: true,
     },
   }));
+}
 
-  await db.collection('members').bulkWrite(ops);
-  return ops.length;
+// The watermark is the start time of the last walk of an endpoint that ran
+// to completion, so a walk that fails partway leaves it untouched and the
+// next sync re-covers everything since the last good run. Items updated
+// during a walk are newer than its start, so they're picked up next time.
+async function updatedAfter(projectId, endpoint) {
+  const state = await getDB().collection('sync_state').findOne({ project_id: projectId, endpoint });
+  if (!state) return null;
+  return new Date(state.started_at.getTime() - SINCE_OVERLAP_MS).toISOString();
 }
 
+async function markSynced(projectId, endpoint, startedAt) {
+  await getDB().collection('sync_state').updateOne(
+    { project_id: projectId, endpoint },
+    { $set: { project_id: projectId, endpoint, started_at: startedAt } },
+    { upsert: true }
+  );
+}
+
+// Always a full walk: GitLab's since= filters on commit date, not push date,
+// so commits pushed days after they were made would be skipped for good.
 async function syncCommits(projectId) {
   const db = getDB();
-  const commits = await paginatedGet(
+  const pages = paginate(
     `${GITLAB_URL}/api/v4/projects/${projectId}/repository/commits`,
     { all: true, with_stats: true }
   );
-  if (!commits.length) return 0;
 
-  const ops = commits.map(c => {
+  return upsertPages(db.collection('commits'), pages, c => {
     const stats = c.stats || {};
     return {
       updateOne: {
@@ -114,7 +258,9 @@ async function syncCommits(projectId) {
             author_name: c.author_name,
             author_email: c.author_email,
             committed_date: c.committed_date,
+            committed_day: c.committed_date ? c.committed_date.substring(0, 10) : null,
             message: c.message,
+            commit_type: commitType(c.message),
             additions: stats.additions || 0,
             deletions: stats.deletions || 0,
             total: stats.total || 0,
@@ -124,20 +270,18 @@ async function syncCommits(projectId) {
       },
     };
   });
-
-  await db.collection('commits').bulkWrite(ops);
-  return ops.length;
 }
 
 async function syncMergeRequests(projectId) {
   const db = getDB();
-  const mrs = await paginatedGet(
-    `${GITLAB_URL}/api/v4/projects/${projectId}/merge_requests`,
-    { state: 'all' }
-  );
-  if (!mrs.length) return 0;
+  const startedAt = new Date();
+  const params = { state: 'all' };
+  const since = await updatedAfter(projectId, 'merge_requests');
+  if (since) params.updated_after = since;
 
-  const ops = mrs.map(mr => {
+  const pages = paginate(`${GITLAB_URL}/api/v4/projects/${projectId}/merge_requests`, params);
+
+  const count = await upsertPages(db.collection('merge_requests'), pages, mr => {
     const author = mr.author || {};
     return {
       updateOne: {
@@ -151,6 +295,7 @@ async function syncMergeRequests(projectId) {
             author_name: author.name || null,
             state: mr.state,
             created_at: mr.created_at,
+            updated_at: mr.updated_at,
             merged_at: mr.merged_at || null,
             closed_at: mr.closed_at || null,
             source_branch: mr.source_branch,
@@ -162,20 +307,20 @@ async function syncMergeRequests(projectId) {
       },
     };
   });
-
-  await db.collection('merge_requests').bulkWrite(ops);
-  return ops.length;
+  await markSynced(projectId, 'merge_requests', startedAt);
+  return count;
 }
 
 async function syncIssues(projectId) {
   const db = getDB();
-  const issues = await paginatedGet(
-    `${GITLAB_URL}/api/v4/projects/${projectId}/issues`,
-    { state: 'all' }
-  );
-  if (!issues.length) return 0;
+  const startedAt = new Date();
+  const params = { state: 'all' };
+  const since = await updatedAfter(projectId, 'issues');
+  if (since) params.updated_after = since;
 
-  const ops = issues.map(issue => {
+  const pages = paginate(`${GITLAB_URL}/api/v4/projects/${projectId}/issues`, params);
+
+  const count = await upsertPages(db.collection('issues'), pages, issue => {
     const author = issue.author || {};
     const assignees = (issue.assignees || []).map(a => ({
       username: a.username,
@@ -195,6 +340,7 @@ async function syncIssues(projectId) {
             state: issue.state,
             labels: issue.labels || [],
             created_at: issue.created_at,
+            updated_at: issue.updated_at,
             closed_at: issue.closed_at || null,
           },
         },
@@ -202,30 +348,115 @@ async function syncIssues(projectId) {
       },
     };
   });
+  await markSynced(projectId, 'issues', startedAt);
+  return count;
+}
 
-  await db.collection('issues').bulkWrite(ops);
-  return ops.length;
+const typeCount = (type) => ({ $sum: { $cond: [{ $eq: ['$commit_type', type] }, 1, 0] } });
+
+// Derives committed_day / commit_type in place for commits stored before
+// those fields existed. Neither filter is indexed, so this runs once at
+// startup rather than on every sync; synced commits get both fields set.
+// Resolves to the number of commits updated.
+async function backfillCommitFields() {
+  const db = getDB();
+  const results = await Promise.all([
+    db.collection('commits').updateMany({ committed_day: { $exists: false } }, [
+      { $set: { committed_day: { $substr: ['$committed_date', 0, 10] } } },
+    ]),
+    db.collection('commits').updateMany({ commit_type: { $exists: false } }, [
+      { $set: {
+        commit_type: {
+          $switch: {
+            branches: COMMIT_TYPES.map(type => ({
+              case: { $regexMatch: { input: '$message', regex: commitTypePattern(type), options: 'i' } },
+              then: type,
+            })),
+            default: 'other',
+          },
+        },
+      }},
+    ]),
+  ]);
+  return results.reduce((sum, r) => sum + r.modifiedCount, 0);
+}
+
+async function rebuildDailyStats() {
+  const db = getDB();
+  await db.collection('commits').aggregate([
+    { $group: {
+      _id: {
+        project_id: '$project_id',
+        author_name: '$author_name',
+        day: '$committed_day',
+      },
+      count: { $sum: 1 },
+      additions: { $sum: '$additions' },
+      deletions: { $sum: '$deletions' },
+      feat: typeCount('feat'),
+      fix: typeCount('fix'),
+      docs: typeCount('docs'),
+      chore: typeCount('chore'),
+    }},
+    { $project: {
+      _id: 0,
+      project_id: '$_id.project_id',
+      author_name: '$_id.author_name',
+      day: '$_id.day',
+      count: 1,
+      additions: 1,
+      deletions: 1,
+      feat: 1,
+      fix: 1,
+      docs: 1,
+      chore: 1,
+    }},
+    { $out: 'commits_daily' },
+  ], { allowDiskUse: true }).toArray();
+}
+
+async function ensureDailyStats() {
+  const db = getDB();
+  const backfilled = await backfillCommitFields();
+  const daily = await db.collection('commits_daily').estimatedDocumentCount();
+  if (backfilled > 0 || daily === 0) {
+    const commits = await db.collection('commits').estimatedDocumentCount();
+    if (commits === 0) return;
+    console.log('[gitlab-sync] Building commits_daily rollup');
+    await rebuildDailyStats();
+    clearCache();
+  }
 }
 
 async function runSync() {
   const startTime = Date.now();
   console.log(`[gitlab-sync] Starting sync at ${new Date().toISOString()}`);
 
+  let projectCount = 0;
+  try {
+    projectCount = await syncProjects();
+  } catch (err) {
+    console.error('[gitlab-sync] Sync failed:', err.message);
+  }
+
+  // Runs even after a partial failure, so the rollup and the cached charts
+  // never lag behind whatever did reach the raw collections.
   try {
-    const projectCount = await syncProjects();
+    await rebuildDailyStats();
 
     const db = getDB();
     console.log('[gitlab-sync] === MongoDB summary (afonsystem) ===');
-    for (const col of ['projects', 'members', 'commits', 'merge_requests', 'issues']) {
-      const count = await db.collection(col).countDocuments({});
-      console.log(`[gitlab-sync]   ${col}: ${count} documents`);
-    }
-
-    const elapsed = ((Date.now() - startTime) / 1000).toFixed(1);
-    console.log(`[gitlab-sync] Sync completed: ${projectCount} projects in ${elapsed}s`);
+    const collections = ['projects', 'members', 'commits', 'commits_daily', 'merge_requests', 'issues'];
+    const counts = await Promise.all(collections.map(col => db.collection(col).estimatedDocumentCount()));
+    collections.forEach((col, i) => console.log(`[gitlab-sync]   ${col}: ${counts[i]} documents`));
   } catch (err) {
-    console.error('[gitlab-sync] Sync failed:', err.message);
+    console.error('[gitlab-sync] Rollup rebuild failed:', err.message);
+  } finally {
+    clearCache();
   }
+
+  const elapsed = ((Date.now() - startTime) / 1000).toFixed(1);
+  console.log(`[gitlab-sync] Sync finished: ${projectCount} projects in ${elapsed}s`);
 }
 
-module.exports = { runSync };
+module.exports = { runSync, ensureDailyStats };
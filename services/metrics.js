@@ -0,0 +1,60 @@
+const { getDB } = require('../config/db');
+const { cached } = require('../utils/cache');
+
+function commitsByAuthor(filter) {
+  const db = getDB();
+  return cached(`commits-by-author:${JSON.stringify(filter)}`, () =>
+    db.collection('commits_daily').aggregate([
+      { $match: filter },
+      { $group: {
+        _id: '$author_name',
+        count: { $sum: '$count' },
+        additions: { $sum: '$additions' },
+        deletions: { $sum: '$deletions' },
+      }},
+    ]).toArray()
+  );
+}
+
+// Dashboard KPI tiles: commit total and conventional-commit type counts.
+function commitTotals(filter) {
+  const db = getDB();
+  return cached(`commit-totals:${JSON.stringify(filter)}`, () =>
+    db.collection('commits_daily').aggregate([
+      { $match: filter },
+      { $group: {
+        _id: null,
+        total: { $sum: '$count' },
+        feat: { $sum: '$feat' },
+        fix: { $sum: '$fix' },
+        docs: { $sum: '$docs' },
+        chore: { $sum: '$chore' },
+      }},
+    ]).toArray()
+  );
+}
+
+function commitsPerDay(filter) {
+  const db = getDB();
+  return cached(`commits-over-time:${JSON.stringify(filter)}`, () =>
+    db.collection('commits_daily').aggregate([
+      { $match: filter },
+      { $group: { _id: '$day', count: { $sum: '$count' } } },
+      { $sort: { _id: 1 } },
+    ]).toArray()
+  );
+}
+
+// Per-state counts for merge_requests or issues. Shared by the dashboard
+// totals and the status charts so one aggregation serves both.
+function stateCounts(collection, filter) {
+  const db = getDB();
+  return cached(`${collection}-by-state:${JSON.stringify(filter)}`, () =>
+    db.collection(collection).aggregate([
+      { $match: filter },
+      { $group: { _id: '$state', count: { $sum: 1 } } },
+    ]).toArray()
+  );
+}
+
+module.exports = { commitsByAuthor, commitTotals, commitsPerDay, stateCounts };
@@ -0,0 +1,42 @@
+const DEFAULT_TTL_MS = 10 * 60 * 1000;
+
+// Keys embed user-supplied filters, so the store is bounded: expired entries
+// are dropped on access and the least recently used one goes past the cap.
+const MAX_ENTRIES = 500;
+
+// Map iteration order doubles as recency order: hits are re-inserted at the end.
+const store = new Map();
+
+function pruneExpired(now) {
+  for (const [key, entry] of store) {
+    if (entry.expires <= now) store.delete(key);
+  }
+}
+
+function cached(key, fn, ttlMs = DEFAULT_TTL_MS) {
+  const now = Date.now();
+  const hit = store.get(key);
+  if (hit) {
+    store.delete(key);
+    if (hit.expires > now) {
+      store.set(key, hit);
+      return hit.value;
+    }
+  }
+
+  const value = fn();
+  const entry = { value, expires: now + ttlMs };
+  store.set(key, entry);
+  if (store.size > MAX_ENTRIES) pruneExpired(now);
+  while (store.size > MAX_ENTRIES) store.delete(store.keys().next().value);
+  value.catch(() => {
+    if (store.get(key) === entry) store.delete(key);
+  });
+  return value;
+}
+
+function clearCache() {
+  store.clear();
+}
+
+module.exports = { cached, clearCache };
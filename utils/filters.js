@@ -1,37 +1,20 @@
-function buildCommitFilter(query) {
-  const filter = {};
-  if (query.project_id) filter.project_id = parseInt(query.project_id);
-  if (query.username) filter.author_name = query.username;
-  if (query.from || query.to) {
-    filter.committed_date = {};
-    if (query.from) filter.committed_date.$gte = query.from;
-    if (query.to) filter.committed_date.$lte = query.to + 'T23:59:59Z';
-  }
-  return filter;
+function filterBuilder({ userField, dateField, endOfDay = 'T23:59:59Z' }) {
+  return function (query) {
+    const filter = {};
+    if (query.project_id) filter.project_id = parseInt(query.project_id);
+    if (query.username) filter[userField] = String(query.username);
+    if (query.from || query.to) {
+      filter[dateField] = {};
+      if (query.from) filter[dateField].$gte = String(query.from);
+      if (query.to) filter[dateField].$lte = String(query.to) + endOfDay;
+    }
+    return filter;
+  };
 }
 
-function buildMRFilter(query) {
-  const filter = {};
-  if (query.project_id) filter.project_id = parseInt(query.project_id);
-  if (query.username) filter.author_username = query.username;
-  if (query.from || query.to) {
-    filter.created_at = {};
-    if (query.from) filter.created_at.$gte = query.from;
-    if (query.to) filter.created_at.$lte = query.to + 'T23:59:59Z';
-  }
-  return filter;
-}
-
-function buildIssueFilter(query) {
-  const filter = {};
-  if (query.project_id) filter.project_id = parseInt(query.project_id);
-  if (query.username) filter.author_username = query.username;
-  if (query.from || query.to) {
-    filter.created_at = {};
-    if (query.from) filter.created_at.$gte = query.from;
-    if (query.to) filter.created_at.$lte = query.to + 'T23:59:59Z';
-  }
-  return filter;
-}
+const buildCommitFilter = filterBuilder({ userField: 'author_name', dateField: 'committed_date' });
+const buildDailyFilter = filterBuilder({ userField: 'author_name', dateField: 'day', endOfDay: '' });
+const buildMRFilter = filterBuilder({ userField: 'author_username', dateField: 'created_at' });
+const buildIssueFilter = filterBuilder({ userField: 'author_username', dateField: 'created_at' });
 
-module.exports = { buildCommitFilter, buildMRFilter, buildIssueFilter };
+module.exports = { buildCommitFilter, buildDailyFilter, buildMRFilter, buildIssueFilter };